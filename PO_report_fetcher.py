@@ -4,11 +4,26 @@ Provides functions to schedule and download PO reports from Oracle BI Publisher
 """
 
 import base64
+import binascii
+import glob
+import io
+import itertools
 import os
+import random
+import re
+import shutil
+import tempfile
+import threading
 import time
 import datetime
+from functools import lru_cache
+from cachetools import TTLCache, cached
+from lxml import etree
+from xml.sax.saxutils import escape
 from requests import Session
+from requests.adapters import HTTPAdapter
 from zeep import Client, Settings
+from zeep.cache import SqliteCache
 from zeep.transports import Transport
 from zeep.wsse.username import UsernameToken
 import urllib3
@@ -23,6 +38,7 @@ load_dotenv()
 # -------------------------------
 BIP_WSDL = "https://ehkp.fa.em2.oraclecloud.com/xmlpserver/services/PublicReportService?wsdl"
 SCHEDULE_WSDL = "https://ehkp.fa.em2.oraclecloud.com/xmlpserver/services/v2/ScheduleService?wsdl"
+SCHEDULE_ENDPOINT = SCHEDULE_WSDL.split("?")[0]
 USERNAME = os.getenv("ORACLE_USERNAME")    
 PASSWORD = os.getenv("ORACLE_PASSWORD")
 REPORT_PATH = "/Custom/Procurement/Purchasing/PO Report/PO_RECP_INV_V8.xdo"
@@ -30,16 +46,67 @@ REPORT_PATH = "/Custom/Procurement/Purchasing/PO Report/PO_RECP_INV_V8.xdo"
 # Default date range
 DEFAULT_FROM_DATE = "01-01-2020"
 
+# Parsed WSDL is cached on disk so new processes skip the download and parse
+WSDL_CACHE_PATH = os.path.join(tempfile.gettempdir(), "zeep.db")
+WSDL_CACHE_TIMEOUT = 86400  # seconds
+
+# Downloaded reports are kept on disk so a repeat run for the same date
+# range within the timeout skips scheduling and downloading
+REPORT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "po_reports")
+REPORT_CACHE_TIMEOUT = 3600  # seconds
+REPORT_CACHE_MAX_BYTES = 128 * 1024 * 1024  # oldest reports are dropped beyond this
+
+# Job statuses reported by getScheduledReportStatus
+# PROBLEM typically means delivery failed but report generation succeeded
+SUCCESS_STATUSES = {'SUCCESS', 'PROBLEM'}
+FAILED_STATUSES = {'FAILED', 'CANCELLED', 'CANCELED', 'SKIPPED'}
+
+# Resolved instance IDs are reused for this long before Oracle is asked again
+INSTANCE_ID_CACHE_TTL = 600  # seconds
+
+# Report downloads are read off the socket in chunks of this size, and
+# report files are buffered and copied in blocks of the same size
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # bytes
+SOAP_HEADERS = {'Content-Type': 'text/xml; charset=utf-8', 'SOAPAction': '""'}
+
+# Placeholder for the job ID in the pre-serialized status request
+JOB_ID_MARKER = b"__JOB_ID__"
+
 # -------------------------------
 # SETUP CLIENTS
 # -------------------------------
-session = Session()
-session.verify = False
-transport = Transport(session=session, timeout=12000)
 settings = Settings(strict=False, xml_huge_tree=True)
 
-# Schedule client for scheduling and downloading reports
-schedule_client = Client(wsdl=SCHEDULE_WSDL, wsse=UsernameToken(USERNAME, PASSWORD))
+# Parser for responses read without zeep; never fetches or expands entities
+_response_parser = etree.XMLParser(resolve_entities=False, no_network=True)
+
+
+@lru_cache(maxsize=None)
+def _get_client():
+    """
+    Build the schedule client once and reuse it for every SOAP call.
+    
+    The underlying session keeps a pool of keep-alive connections to Oracle,
+    so repeated calls skip the TCP and TLS handshake.
+    
+    Returns:
+        zeep.Client: Client for scheduling and downloading reports
+    """
+    session = Session()
+    session.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=3))
+    
+    transport = Transport(
+        session=session,
+        cache=SqliteCache(path=WSDL_CACHE_PATH, timeout=WSDL_CACHE_TIMEOUT),
+        timeout=12000
+    )
+    
+    return Client(
+        wsdl=SCHEDULE_WSDL,
+        wsse=UsernameToken(USERNAME, PASSWORD),
+        transport=transport,
+        settings=settings
+    )
 
 
 def _make_param_dict(name, val):
@@ -127,7 +194,7 @@ def _schedule_report(from_date, to_date):
         "userJobDesc": "PO Report generated via Python API"
     }
     
-    resp = schedule_client.service.scheduleReport(
+    resp = _get_client().service.scheduleReport(
         scheduleRequest=schedule_req_dict,
         userID=USERNAME,
         password=PASSWORD
@@ -146,6 +213,38 @@ def _schedule_report(from_date, to_date):
     return job_id
 
 
+@cached(TTLCache(maxsize=256, ttl=INSTANCE_ID_CACHE_TTL), lock=threading.Lock())
+def _lookup_instance_id(job_id):
+    """
+    Internal function to fetch the first instance ID of a job from Oracle.
+    
+    Results are memoized per job ID for INSTANCE_ID_CACHE_TTL seconds;
+    failed lookups raise and are not cached.
+    
+    Args:
+        job_id (str): Job ID to look up
+        
+    Returns:
+        str: Instance ID reported by Oracle
+    
+    Raises:
+        Exception: If Oracle returns no instance for the job
+    """
+    # Note: using submittedJobId based on WSDL requirement
+    instances = _get_client().service.getAllJobInstanceIDs(
+        submittedJobId=job_id,
+        userID=USERNAME,
+        password=PASSWORD
+    )
+    
+    if instances and hasattr(instances, 'item'):
+        instance_list = instances.item if isinstance(instances.item, list) else [instances.item]
+        if instance_list:
+            return instance_list[0]
+    
+    raise Exception("No job instances returned")
+
+
 def _resolve_instance_id(job_id):
     """
     Internal function to resolve job ID to instance ID with fallback logic.
@@ -157,20 +256,9 @@ def _resolve_instance_id(job_id):
         str: Resolved instance ID
     """
     try:
-        # Try to get instance IDs
-        # Note: using submittedJobId based on WSDL requirement
-        instances = schedule_client.service.getAllJobInstanceIDs(
-            submittedJobId=str(job_id),
-            userID=USERNAME,
-            password=PASSWORD
-        )
-        
-        if instances and hasattr(instances, 'item'):
-            instance_list = instances.item if isinstance(instances.item, list) else [instances.item]
-            if instance_list:
-                instance_id = instance_list[0]
-                print(f"Resolved Job ID {job_id} to Instance ID {instance_id}")
-                return instance_id
+        instance_id = _lookup_instance_id(str(job_id))
+        print(f"Resolved Job ID {job_id} to Instance ID {instance_id}")
+        return instance_id
                 
     except Exception as e:
         print(f"Warning: Could not resolve instance ID for {job_id}: {e}")
@@ -181,13 +269,17 @@ def _resolve_instance_id(job_id):
     return fallback_id
 
 
-def _wait_for_completion(job_id, poll_interval=10, timeout=3600):
+def _wait_for_completion(job_id, initial_interval=2, max_interval=60, timeout=3600):
     """
     Internal function to wait for report completion.
     
+    Polls with exponential backoff plus jitter, so short jobs are picked up
+    quickly and long jobs do not flood Oracle with status calls.
+    
     Args:
         job_id (str): Job ID to monitor
-        poll_interval (int): Seconds between status checks
+        initial_interval (int): Seconds before the second status check
+        max_interval (int): Upper bound in seconds between status checks
         timeout (int): Maximum seconds to wait
     
     Returns:
@@ -197,29 +289,75 @@ def _wait_for_completion(job_id, poll_interval=10, timeout=3600):
         Exception: If job fails or times out
     """
     start_time = time.time()
+    attempts = 0
     
     while True:
         if time.time() - start_time > timeout:
             raise Exception(f"Timeout waiting for job {job_id}")
         
-        status_resp = schedule_client.service.getScheduledReportStatus(
-            scheduledJobID=job_id,
-            userID=USERNAME,
-            password=PASSWORD
-        )
-        
-        status = status_resp.jobStatus
+        status = _get_job_status(job_id)
         status_upper = status.upper() if status else ""
         
-        # SUCCESS or PROBLEM status means output is available
-        # PROBLEM typically means delivery failed but report generation succeeded
-        if status_upper in ['SUCCESS', 'PROBLEM']:
+        if status_upper in SUCCESS_STATUSES:
             # Resolve the instance ID (with fallback to job_id + 1)
             return _resolve_instance_id(job_id)
-        elif status_upper in ['FAILED', 'CANCELLED', 'CANCELED', 'SKIPPED']:
+        elif status_upper in FAILED_STATUSES:
             raise Exception(f"Job failed with status: {status}")
         
-        time.sleep(poll_interval)
+        interval = min(max_interval, initial_interval * 2 ** attempts) + random.uniform(0, 1)
+        attempts += 1
+        time.sleep(interval)
+
+
+def _get_job_status(job_id):
+    """
+    Internal function to fetch the status of a scheduled job.
+    
+    This is called on every poll, so it posts a pre-serialized request and
+    reads the status straight from the response instead of going through
+    zeep. Anything unexpected falls back to the zeep call, which also turns
+    SOAP faults into exceptions.
+    
+    Args:
+        job_id (str): Job ID to check
+    
+    Returns:
+        str: Job status reported by Oracle, e.g. 'Running' or 'Success'
+    """
+    body = _status_envelope().replace(JOB_ID_MARKER, escape(str(job_id)).encode())
+    response = _post_envelope(body)
+    
+    if response.status_code == 200:
+        status = etree.fromstring(response.content, parser=_response_parser).findtext('.//{*}jobStatus')
+        if status is not None:
+            return status
+    
+    status_resp = _get_client().service.getScheduledReportStatus(
+        scheduledJobID=job_id,
+        userID=USERNAME,
+        password=PASSWORD
+    )
+    return status_resp.jobStatus
+
+
+@lru_cache(maxsize=None)
+def _status_envelope():
+    """
+    Serialize the getScheduledReportStatus request once, with JOB_ID_MARKER
+    in place of the job ID.
+    
+    Returns:
+        bytes: SOAP envelope
+    """
+    client = _get_client()
+    envelope = client.create_message(
+        client.service,
+        'getScheduledReportStatus',
+        scheduledJobID=JOB_ID_MARKER.decode(),
+        userID=USERNAME,
+        password=PASSWORD
+    )
+    return etree.tostring(envelope)
 
 
 def _download_output(job_instance_id):
@@ -232,8 +370,21 @@ def _download_output(job_instance_id):
     Returns:
         bytes: Raw Excel file data
     """
+    output_buffer = io.BytesIO()
+    _write_output(job_instance_id, output_buffer)
+    return output_buffer.getvalue()
+
+
+def _write_output(job_instance_id, out):
+    """
+    Internal function to download report output into a binary file object.
+    
+    Args:
+        job_instance_id (str): Job instance ID
+        out (file): Writable, seekable binary file object (e.g. an open file or io.BytesIO)
+    """
     # Get output info
-    output_info = schedule_client.service.getScheduledReportOutputInfo(
+    output_info = _get_client().service.getScheduledReportOutputInfo(
         jobInstanceID=job_instance_id,
         userID=USERNAME,
         password=PASSWORD
@@ -254,8 +405,16 @@ def _download_output(job_instance_id):
     if not output_id:
         raise Exception("No output ID found")
     
-    # Download the document
-    doc_resp = schedule_client.service.getDocumentData(
+    # Download the document, decoding the base64 payload as it arrives
+    try:
+        _stream_document_data(str(output_id), out.write)
+        return
+    except ValueError as e:
+        print(f"Streaming download unavailable ({e}), falling back to zeep")
+        out.seek(0)
+        out.truncate()
+    
+    doc_resp = _get_client().service.getDocumentData(
         jobOutputID=str(output_id),
         userID=USERNAME,
         password=PASSWORD
@@ -270,20 +429,278 @@ def _download_output(job_instance_id):
             file_data += "=" * (4 - missing)
         file_data = base64.b64decode(file_data)
     
-    return file_data
+    out.write(file_data)
+
+
+def _post_soap(operation, stream=False, **params):
+    """
+    Internal function to POST a schedule service operation without zeep's
+    response parsing.
+    
+    Args:
+        operation (str): Operation name, e.g. 'getDocumentData'
+        stream (bool): Leave the response body unread for iter_content
+        **params: Operation parameters
+    
+    Returns:
+        requests.Response: Raw HTTP response
+    """
+    client = _get_client()
+    envelope = client.create_message(client.service, operation, **params)
+    return _post_envelope(etree.tostring(envelope), stream=stream)
+
+
+def _post_envelope(body, stream=False):
+    """
+    Internal function to POST a serialized SOAP envelope to the schedule
+    service over the client's pooled session.
+    
+    Args:
+        body (bytes): SOAP envelope
+        stream (bool): Leave the response body unread for iter_content
+    
+    Returns:
+        requests.Response: Raw HTTP response
+    """
+    return _get_client().transport.session.post(
+        SCHEDULE_ENDPOINT,
+        data=body,
+        headers=SOAP_HEADERS,
+        stream=stream
+    )
+
+
+def _stream_document_data(output_id, write):
+    """
+    Internal function to download a report output and decode its base64
+    payload chunk by chunk, so the encoded document is never held in memory.
+    
+    Args:
+        output_id (str): Job output ID
+        write (callable): Called with each decoded block of bytes
+    
+    Raises:
+        ValueError: If the response is not a plain inline base64 payload
+    """
+    response = _post_soap(
+        'getDocumentData',
+        stream=True,
+        jobOutputID=output_id,
+        userID=USERNAME,
+        password=PASSWORD
+    )
+    
+    with response:
+        if response.status_code != 200:
+            raise ValueError(f"HTTP {response.status_code}")
+        if response.headers.get('Content-Type', '').startswith('multipart/'):
+            raise ValueError("multipart response")
+        
+        chunks = response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE)
+        
+        # Skip the envelope up to the opening <getDocumentDataReturn> tag
+        head = b""
+        for chunk in chunks:
+            head += chunk
+            start = head.find(b"getDocumentDataReturn")
+            if start != -1 and head.find(b">", start) != -1:
+                break
+        else:
+            raise ValueError("no document in response")
+        
+        tag_end = head.find(b">", start)
+        if head[tag_end - 1:tag_end] == b"/":
+            raise ValueError("empty document in response")
+        
+        # Decode whole 4-character groups; carry the remainder to the next chunk
+        pending = b""
+        for chunk in itertools.chain([head[tag_end + 1:]], chunks):
+            end = chunk.find(b"<")
+            text = pending + (chunk if end == -1 else chunk[:end]).translate(None, b" \t\r\n")
+            if b"&" in text:
+                raise ValueError("escaped characters in payload")
+            usable = len(text) - len(text) % 4
+            write(binascii.a2b_base64(text[:usable]))
+            pending = text[usable:]
+            if end != -1:
+                break
+        else:
+            raise ValueError("truncated response")
+        
+        if pending:
+            write(binascii.a2b_base64(pending + b"=" * (4 - len(pending))))
+
+
+def _report_cache_prefix(from_date, to_date):
+    """
+    Internal function to get the cache file prefix for a report date range.
+    
+    Args:
+        from_date (str): Start date of the report
+        to_date (str): End date of the report
+    
+    Returns:
+        str: Path prefix; cache files are named <prefix>_job<job_id>.xls
+    """
+    key = re.sub(r"[^0-9A-Za-z-]", "_", f"{from_date}_to_{to_date}")
+    return os.path.join(REPORT_CACHE_DIR, f"PO_Report_{key}")
+
+
+def _find_cached_report(from_date, to_date):
+    """
+    Internal function to find a cached report that has not expired.
+    
+    The cache is pruned first (see _prune_report_cache).
+    
+    Args:
+        from_date (str): Start date of the report
+        to_date (str): End date of the report
+    
+    Returns:
+        tuple or None: (job_id, path), or None if there is no fresh report
+    """
+    _prune_report_cache()
+    
+    prefix = _report_cache_prefix(from_date, to_date)
+    for path in glob.glob(glob.escape(prefix) + "_job*.xls"):
+        job_id = path[len(prefix) + len("_job"):-len(".xls")]
+        return job_id, path
+    return None
+
+
+def _save_cached_report(from_date, to_date, job_id, report_file):
+    """
+    Internal function to copy a downloaded report into the cache.
+    
+    The file is written under a temporary name and then renamed, so a
+    concurrent reader never sees a partial report. Failures are only logged,
+    and the temporary file is removed. The cache is pruned afterwards.
+    
+    Args:
+        from_date (str): Start date of the report
+        to_date (str): End date of the report
+        job_id (str): Job ID of the report
+        report_file (file): Readable, seekable binary file object with the report
+    """
+    cache_path = f"{_report_cache_prefix(from_date, to_date)}_job{job_id}.xls"
+    tmp_path = None
+    try:
+        os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+        report_file.seek(0)
+        with tempfile.NamedTemporaryFile(dir=REPORT_CACHE_DIR, delete=False) as f:
+            tmp_path = f.name
+            shutil.copyfileobj(report_file, f, DOWNLOAD_CHUNK_SIZE)
+        os.replace(tmp_path, cache_path)
+        tmp_path = None
+    except OSError as e:
+        print(f"Warning: Could not cache report: {e}")
+    finally:
+        if tmp_path is not None:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    
+    _prune_report_cache()
+
+
+def _prune_report_cache():
+    """
+    Internal function to delete cached reports that are expired or over
+    the size limit.
+    
+    Every report in REPORT_CACHE_DIR older than REPORT_CACHE_TIMEOUT is
+    deleted, whatever its date range; of the rest, the oldest are deleted
+    until their total size is within REPORT_CACHE_MAX_BYTES.
+    """
+    reports = []
+    for path in glob.glob(os.path.join(glob.escape(REPORT_CACHE_DIR), "PO_Report_*_job*.xls")):
+        try:
+            stat = os.stat(path)
+            if time.time() - stat.st_mtime > REPORT_CACHE_TIMEOUT:
+                os.remove(path)
+            else:
+                reports.append((stat.st_mtime, stat.st_size, path))
+        except OSError:
+            continue
+    
+    # Keep the newest reports that fit within the size limit
+    total_size = 0
+    for _, size, path in sorted(reports, reverse=True):
+        total_size += size
+        if total_size > REPORT_CACHE_MAX_BYTES:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _fetch_report(from_date, to_date, out, use_cache):
+    """
+    Internal function to schedule, wait for and download a report into a
+    binary file object, going through the report cache.
+    
+    Args:
+        from_date (str): Start date in format MM-DD-YYYY
+        to_date (str): End date in format MM-DD-YYYY
+        out (file): Readable, writable, seekable binary file object
+        use_cache (bool): Reuse a recently fetched report
+    
+    Returns:
+        str: Job ID of the report
+    """
+    if use_cache:
+        cached_report = _find_cached_report(from_date, to_date)
+        if cached_report is not None:
+            job_id, cache_path = cached_report
+            print(f"Using cached report for {from_date} to {to_date} (Job ID {job_id})")
+            with open(cache_path, "rb", buffering=0) as f:
+                shutil.copyfileobj(f, out, DOWNLOAD_CHUNK_SIZE)
+            return job_id
+    
+    # Schedule the report
+    job_id = _schedule_report(from_date, to_date)
+    
+    # Wait for completion
+    job_instance_id = _wait_for_completion(job_id)
+    
+    # Download the output
+    _write_output(job_instance_id, out)
+    
+    _save_cached_report(from_date, to_date, job_id, out)
+    
+    return job_id
 
 
 # -------------------------------
 # PUBLIC API FUNCTIONS
 # -------------------------------
+def get_bip_session():
+    """
+    Get the shared, pooled HTTP session used for every Oracle BIP call.
+    
+    The first call loads the schedule service WSDL and builds the client;
+    later calls return the same session, so its keep-alive connections are
+    reused across reports.
+    
+    Returns:
+        requests.Session: Session behind the schedule client
+    """
+    return _get_client().transport.session
 
-def run_po_report(to_date=None, from_date=DEFAULT_FROM_DATE):
+
+
+def run_po_report(to_date=None, from_date=DEFAULT_FROM_DATE, use_cache=True):
     """
     Schedule, wait for completion, and download a PO report.
     
+    A report fetched for the same date range in the last
+    REPORT_CACHE_TIMEOUT seconds is returned from disk instead.
+    
     Args:
         to_date (str, optional): End date in format MM-DD-YYYY. Defaults to today.
         from_date (str, optional): Start date in format MM-DD-YYYY. Defaults to 01-01-2020.
+        use_cache (bool, optional): Reuse a recently fetched report. Defaults to True.
     
     Returns:
         tuple: (job_id, file_data) where file_data is bytes of the Excel file
@@ -296,16 +713,35 @@ def run_po_report(to_date=None, from_date=DEFAULT_FROM_DATE):
     if to_date is None:
         to_date = datetime.datetime.now().strftime("%m-%d-%Y")
     
-    # Schedule the report
-    job_id = _schedule_report(from_date, to_date)
+    report_buffer = io.BytesIO()
+    job_id = _fetch_report(from_date, to_date, report_buffer, use_cache)
+    return job_id, report_buffer.getvalue()
+
+
+def run_po_report_to_file(dest_path, to_date=None, from_date=DEFAULT_FROM_DATE, use_cache=True):
+    """
+    Schedule, wait for completion, and download a PO report to a file.
     
-    # Wait for completion
-    job_instance_id = _wait_for_completion(job_id)
+    The download is decoded and written to disk as it arrives, so the
+    report is never held in memory as a whole.
     
-    # Download the output
-    file_data = _download_output(job_instance_id)
+    Args:
+        dest_path (str): Path to write the Excel file to
+        to_date (str, optional): End date in format MM-DD-YYYY. Defaults to today.
+        from_date (str, optional): Start date in format MM-DD-YYYY. Defaults to 01-01-2020.
+        use_cache (bool, optional): Reuse a recently fetched report. Defaults to True.
     
-    return job_id, file_data
+    Returns:
+        str: Job ID of the report
+    
+    Example:
+        job_id = run_po_report_to_file("report.xls", to_date="12-04-2025")
+    """
+    if to_date is None:
+        to_date = datetime.datetime.now().strftime("%m-%d-%Y")
+    
+    with open(dest_path, "w+b", buffering=DOWNLOAD_CHUNK_SIZE) as out:
+        return _fetch_report(from_date, to_date, out, use_cache)
 
 
 def download_po_report(job_id):
@@ -329,6 +765,22 @@ def download_po_report(job_id):
     return file_data
 
 
+def download_po_report_to_file(job_id, dest_path):
+    """
+    Download a PO report from an existing job ID to a file.
+    
+    Args:
+        job_id (str): The job ID of a previously scheduled report
+        dest_path (str): Path to write the Excel file to
+    
+    Example:
+        download_po_report_to_file("2995978", "report.xls")
+    """
+    job_instance_id = _resolve_instance_id(job_id)
+    with open(dest_path, "wb", buffering=DOWNLOAD_CHUNK_SIZE) as out:
+        _write_output(job_instance_id, out)
+
+
 if __name__ == "__main__":
     # Test the functions
     print("Testing PO Report Fetcher...")
@@ -8,8 +8,48 @@ Processes raw PO reports from Oracle BIP and generates three output files:
 
 import pandas as pd
 import numpy as np
-from datetime import datetime
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time
+from python_calamine import CalamineWorkbook
 import io
+import os
+
+# Columns the processed reports read; the header row of every report
+# must contain these (after stripping stray whitespace)
+REQUIRED_COLUMNS = (
+    'Po Number',
+    'POCharge A/c',
+    'Supplier',
+    'Currency',
+    'Invoice Number',
+    'Invoice Line Number',
+    'Line Amount',
+    'Line Maount in Functional Currency',  # Keep original spelling from data
+    'Amount Received',
+    'Amount in transaction Currency',
+    'Amount in Functional Currency',
+)
+
+# Amount columns the reports do arithmetic on; never made categorical
+AMOUNT_COLUMNS = (
+    'Line Amount',
+    'Line Maount in Functional Currency',
+    'Amount Received',
+    'Amount in transaction Currency',
+    'Amount in Functional Currency',
+)
+
+# Rows kept in the report previews
+PREVIEW_ROWS = 10
+
+# Leading bytes of the two Excel container formats (legacy OLE .xls and
+# zip-based .xlsx and friends), and the extensions calamine reads as zip
+OLE_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+ZIP_MAGIC = b"PK\x03\x04"
+ZIP_SUFFIXES = ('.xlsx', '.xlsm', '.xlsb', '.ods')
 
 
 def process_po_report(excel_data, from_date="01-01-2024", to_date=datetime.now().strftime("%d-%m-%Y")):
@@ -17,7 +57,8 @@ def process_po_report(excel_data, from_date="01-01-2024", to_date=datetime.now()
     Process PO report Excel data and generate three output files.
     
     Args:
-        excel_data (bytes): Raw Excel file data (.xls format with multiple sheets)
+        excel_data (bytes or str): Raw Excel file data (.xls format with multiple sheets),
+            or a path to the Excel file
         from_date (str): Start date of the report (MM-DD-YYYY)
         to_date (str): End date of the report (MM-DD-YYYY)
     
@@ -37,17 +78,22 @@ def process_po_report(excel_data, from_date="01-01-2024", to_date=datetime.now()
     combined_df.insert(1, 'Date Range', f'{from_date} to {to_date}')
     combined_df.insert(2, 'Generation Date', generation_date)
     
-    # Step 2: Create processed (aggregated) report
-    processed_df = _create_processed_report(combined_df)
+    # Steps 2 and 3 only read combined_df, so build both reports in parallel
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        # Step 2: Create processed (aggregated) report
+        processed_future = executor.submit(_create_processed_report, combined_df)
+        
+        # Step 3: Create processed detailed report
+        detailed_future = executor.submit(_create_ProcessedDetailed_report, combined_df)
+        
+        processed_df = processed_future.result()
+        ProcessedDetailed_df = detailed_future.result()
     
     # Add metadata columns to processed report
     processed_df.insert(0, 'Report Type', 'Processed')
     processed_df.insert(1, 'Date Range', f'{from_date} to {to_date}')
     processed_df.insert(2, 'Generation Date', generation_date)
     
-    # Step 3: Create processed detailed report
-    ProcessedDetailed_df = _create_ProcessedDetailed_report(combined_df)
-    
     # Add metadata columns to processed detailed report
     ProcessedDetailed_df.insert(0, 'Report Type', 'ProcessedDetailed')
     ProcessedDetailed_df.insert(1, 'Date Range', f'{from_date} to {to_date}')
@@ -61,39 +107,159 @@ def _combine_excel_sheets(excel_data):
     Combine all sheets from a multi-sheet Excel file into one DataFrame.
     
     Args:
-        excel_data (bytes): Raw Excel file data
+        excel_data (bytes or str): Raw Excel file data, or a path to the Excel file
     
     Returns:
         pd.DataFrame: Combined data from all sheets
     """
-    # Load workbook
-    xls = pd.ExcelFile(io.BytesIO(excel_data))
-    sheet_names = xls.sheet_names
+    return _read_excel_sheets(excel_data).to_pandas()
+
+
+def _read_excel_sheets(excel_data):
+    """
+    Parse all sheets of the Excel file with calamine into one Arrow table.
+    
+    The first sheet carries the header row; remaining sheets are data only
+    and are skipped if their column count does not match the header.
+    
+    Args:
+        excel_data (bytes or str): Raw Excel file data, or a path to the Excel file
+    
+    Returns:
+        pa.Table: Combined data from all sheets
+    
+    Raises:
+        Exception: If the header lacks any of REQUIRED_COLUMNS
+    """
+    if isinstance(excel_data, (str, os.PathLike)):
+        wb = _open_workbook(excel_data)
+    else:
+        wb = CalamineWorkbook.from_filelike(io.BytesIO(excel_data))
+    sheet_names = wb.sheet_names
     
     # Read first sheet (with headers)
-    df_first = pd.read_excel(xls, sheet_name=sheet_names[0], header=0)
-    df_first.columns = df_first.columns.str.strip()  # Clean up column names
-    columns_template = df_first.columns
+    rows = wb.get_sheet_by_name(sheet_names[0]).to_python()
+    columns_template = [str(c).strip() for c in rows[0]]  # Clean up column names
+    
+    missing = [c for c in REQUIRED_COLUMNS if c not in columns_template]
+    if missing:
+        raise Exception(f"Report header is missing expected columns: {', '.join(missing)}")
     
-    # List to hold all dataframes
-    df_list = [df_first]
+    # Cell values are gathered column by column, one sheet at a time, so only
+    # a single sheet's rows are ever held alongside the combined columns
+    column_values = [list(values[1:]) for values in zip(*rows)] or [[] for _ in columns_template]
+    del rows
     
     # Process remaining sheets (no headers)
     for sheet in sheet_names[1:]:
-        df = pd.read_excel(xls, sheet_name=sheet, header=None)
+        sheet_rows = wb.get_sheet_by_name(sheet).to_python()
+        if not sheet_rows:
+            continue
         
         # If column count mismatches, skip
-        if df.shape[1] != len(columns_template):
-            print(f"Skipping sheet '{sheet}' due to column mismatch: Expected {len(columns_template)}, got {df.shape[1]}")
+        if len(sheet_rows[0]) != len(columns_template):
+            print(f"Skipping sheet '{sheet}' due to column mismatch: Expected {len(columns_template)}, got {len(sheet_rows[0])}")
             continue
         
-        df.columns = columns_template
-        df_list.append(df)
+        for values, sheet_values in zip(column_values, zip(*sheet_rows)):
+            values.extend(sheet_values)
+        del sheet_rows
+    
+    # Build one Arrow column per header across all sheets
+    if column_values[0]:
+        columns = [_excel_column_to_arrow(values) for values in column_values]
+    else:
+        columns = [pa.array([], type=pa.null()) for _ in columns_template]
+    
+    return pa.table(columns, names=columns_template)
+
+
+def _open_workbook(path):
+    """
+    Open an Excel file on disk with calamine.
     
-    # Combine all sheets
-    combined_df = pd.concat(df_list, ignore_index=True)
+    calamine's from_path picks the parser from the file extension, but the
+    app saves every raw download as .xls whatever format BIP returned. A
+    file whose contents match its extension is opened by calamine directly,
+    without a copy in Python; any other file goes through from_filelike,
+    which detects the format from the contents.
     
-    return combined_df
+    Args:
+        path (str or PathLike): Path to the Excel file
+    
+    Returns:
+        CalamineWorkbook: The opened workbook
+    """
+    path = os.fspath(path)
+    suffix = os.path.splitext(path)[1].lower()
+    
+    with open(path, 'rb') as f:
+        magic = f.read(len(OLE_MAGIC))
+        if (
+            (magic.startswith(OLE_MAGIC) and suffix == '.xls')
+            or (magic.startswith(ZIP_MAGIC) and suffix in ZIP_SUFFIXES)
+        ):
+            return CalamineWorkbook.from_path(path)
+        
+        f.seek(0)
+        return CalamineWorkbook.from_filelike(f)
+
+
+def _excel_column_to_arrow(values):
+    """
+    Convert one column of calamine cell values to an Arrow array.
+    
+    Mirrors what pandas.read_excel produced: empty cells become nulls, dates
+    become timestamps, whole-number columns stay integer and columns mixing
+    text with numbers fall back to strings.
+    
+    Args:
+        values (list): Cell values for the column, in row order
+    
+    Returns:
+        pa.Array: Typed column data
+    """
+    values = [None if v == "" else v for v in values]
+    
+    try:
+        arr = pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array([None if v is None else _cell_to_str(v) for v in values], type=pa.string())
+    
+    if pa.types.is_date(arr.type):
+        # Excel has no date-only type; keep the time part of any datetime cells
+        arr = pa.array(
+            [datetime.combine(v, time()) if type(v) is date else v for v in values],
+            type=pa.timestamp('us')
+        )
+    elif (
+        pa.types.is_floating(arr.type)
+        and arr.null_count == 0
+        and len(arr)
+        and pc.all(pc.equal(pc.floor(arr), arr)).as_py()
+    ):
+        arr = arr.cast(pa.int64())
+    
+    return arr
+
+
+def _cell_to_str(value):
+    """
+    Render a cell value of a mixed text/number column as text.
+    
+    calamine returns every number as a float; whole numbers are written
+    without the trailing ".0", as pandas did for them (so identifiers
+    such as invoice numbers keep their value).
+    
+    Args:
+        value: Cell value
+    
+    Returns:
+        str: Text of the value
+    """
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
 
 
 def _create_processed_report(combined_df):
@@ -127,33 +293,43 @@ def _create_processed_report(combined_df):
         'Amount in Functional Currency'
     ]
     
-    # Fill NaN values
-    df[keys] = df[keys].fillna(0)
-    df[num] = df[num].fillna(0)
-    
-    # Group and sum
-    summ = df.groupby(keys)[num].sum().reset_index().sort_values(by=keys[0])
+    # Fill NaN values one column at a time, so only a single column is
+    # ever copied instead of the whole keys/num selection; text keys get
+    # "0" so every key column keeps one type and can be sorted
+    for col in keys:
+        fill_value = "0" if pd.api.types.infer_dtype(df[col], skipna=True) == 'string' else 0
+        df[col] = df[col].fillna(fill_value)
+    
+    # Float amount columns are filled in place when their buffer is writable
+    for col in num:
+        values = df[col].to_numpy()
+        if values.dtype == np.float64 and values.flags.writeable:
+            np.nan_to_num(values, copy=False, nan=0.0, posinf=np.inf, neginf=-np.inf)
+        else:
+            df[col] = df[col].fillna(0)
+    
+    # Categorical text keys: grouping, sorting and the isin below work on int codes
+    for col in ['Po Number', 'POCharge A/c', 'Supplier', 'Currency']:
+        df[col] = df[col].astype('category')
+    
+    # Group and sum; order groups by all keys, then stably by PO, as the
+    # streaming processor does, so duplicate lines keep the same first row
+    summ = df.groupby(keys, observed=True, sort=False)[num].sum().reset_index()
+    summ = summ.sort_values(by=keys).sort_values(by=keys[0], kind='stable')
     
     # Calculate conversion rate
-    summ['conversion rate'] = np.where(
-        (summ['Amount in Functional Currency'] == 0) & (summ['Amount in transaction Currency'] == 0),
-        1,  # if both are zero → set conversion rate = 1
-        summ['Amount in Functional Currency'] / summ['Amount in transaction Currency']
+    summ['conversion rate'] = _conversion_rate(
+        summ['Amount in Functional Currency'],
+        summ['Amount in transaction Currency']
     )
     
     # Handle duplicate invoice lines
     key_cols = ['Po Number', 'Invoice Number', 'Invoice Line Number']
     
-    # Identify duplicates by group
-    summ['dup_index'] = summ.groupby(key_cols).cumcount()
-    
     # For all rows except the first in each group, set amounts to 0
-    mask = summ['dup_index'] > 0
+    mask = _group_cumcount(summ, key_cols) > 0
     summ.loc[mask, ['Line Amount', 'Line Maount in Functional Currency']] = 0
     
-    # Drop helper column
-    summ = summ.drop(columns='dup_index')
-    
     # Calculate differences
     summ['diff'] = summ['Line Amount'] - summ['Amount Received']
     summ['diff InSAR'] = summ['diff'] * summ['conversion rate']
@@ -164,6 +340,94 @@ def _create_processed_report(combined_df):
     return summ
 
 
+def _conversion_rate(functional, transaction):
+    """
+    Divide functional by transaction amounts, with a rate of 1 where both
+    are zero.
+    
+    The division writes straight into the result array and skips the
+    both-zero rows, instead of dividing every row and then selecting.
+    
+    Args:
+        functional (pd.Series): Amounts in functional currency
+        transaction (pd.Series): Amounts in transaction currency
+    
+    Returns:
+        np.ndarray: Conversion rate per row
+    """
+    functional = functional.to_numpy(dtype='float64')
+    transaction = transaction.to_numpy(dtype='float64')
+    rate = np.ones(len(functional))
+    with np.errstate(divide='ignore', invalid='ignore'):  # x/0 stays inf, as with pandas division
+        np.divide(functional, transaction, out=rate, where=(functional != 0) | (transaction != 0))
+    return rate
+
+
+def _grn_amount_in_sar(received, line_adj, rate):
+    """
+    Compute (received - line_adj) * rate, treating missing amounts as zero.
+    
+    Works in a single result buffer: missing line amounts are skipped in the
+    subtraction rather than filled into a copy of the column.
+    
+    Args:
+        received (pd.Series): Amount received
+        line_adj (pd.Series): Adjusted line amount
+        rate (pd.Series): Conversion rate
+    
+    Returns:
+        np.ndarray: GRN amount in SAR per row
+    """
+    result = received.to_numpy(dtype='float64', na_value=0, copy=True)
+    line_adj = line_adj.to_numpy(dtype='float64')
+    with np.errstate(invalid='ignore'):  # 0 * inf stays NaN, as with pandas arithmetic
+        np.subtract(result, line_adj, out=result, where=~np.isnan(line_adj))
+        np.multiply(result, rate.to_numpy(dtype='float64'), out=result)
+    return result
+
+
+def _group_cumcount(df, cols):
+    """
+    Number each row within its group, like df.groupby(cols).cumcount().
+    
+    Key columns are factorized into a single int64 group code, so the
+    ranking runs on integer arrays in NumPy instead of hashing the keys
+    through a pandas groupby. As with groupby, rows with a null key belong
+    to no group and are numbered NaN.
+    
+    Args:
+        df (pd.DataFrame): Data to number
+        cols (list): Grouping key columns
+    
+    Returns:
+        np.ndarray: 0-based position of each row within its group (float
+            with NaN for null-key rows if there are any, otherwise int)
+    """
+    codes = np.zeros(len(df), dtype=np.int64)
+    null_key = np.zeros(len(df), dtype=bool)
+    for col in cols:
+        col_codes, uniques = pd.factorize(df[col])
+        null_key |= col_codes < 0
+        codes, _ = pd.factorize(codes * (len(uniques) + 1) + col_codes + 1)
+    
+    # Stable sort keeps the original row order inside each group
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    positions = np.arange(len(order))
+    
+    is_group_start = np.ones(len(order), dtype=bool)
+    is_group_start[1:] = sorted_codes[1:] != sorted_codes[:-1]
+    group_start = np.maximum.accumulate(np.where(is_group_start, positions, 0))
+    
+    cumcount = np.empty_like(positions)
+    cumcount[order] = positions - group_start
+    
+    if null_key.any():
+        cumcount = cumcount.astype(np.float64)
+        cumcount[null_key] = np.nan
+    return cumcount
+
+
 def _create_ProcessedDetailed_report(combined_df):
     """
     Create processed detailed report with line-level adjustments.
@@ -198,13 +462,151 @@ def _create_ProcessedDetailed_report(combined_df):
     
     # Calculate amounts in SAR
     df['Amount_recieved_in_SAR'] = df['Amount Received'] * df['conversion_rate']
-    df['GRN_amount_in_SAR'] = (
-        df['Amount Received'].fillna(0) - df["Line_amount_adj"].fillna(0)
-    ) * df["conversion_rate"]
+    df['GRN_amount_in_SAR'] = _grn_amount_in_sar(
+        df['Amount Received'],
+        df["Line_amount_adj"],
+        df["conversion_rate"]
+    )
     
     return df
 
 
+def _df_to_csv_bytes(df):
+    """
+    Serialize a DataFrame to UTF-8 CSV bytes with Arrow's native CSV writer.
+    
+    Args:
+        df (pd.DataFrame): Data to serialize (index is not written)
+    
+    Returns:
+        bytes: CSV file contents including the header row
+    """
+    return _table_to_csv_bytes(_df_to_table(df))
+
+
+def _df_to_table(df):
+    """
+    Convert a DataFrame to an Arrow table for serialization.
+    
+    Object columns mixing text and numbers become their string values,
+    with whole numbers written without a trailing ".0" (see _cell_to_str).
+    
+    Args:
+        df (pd.DataFrame): Data to convert (index is dropped)
+    
+    Returns:
+        pa.Table: Converted data
+    """
+    arrays = []
+    for name in df.columns:
+        col = df[name]
+        try:
+            arrays.append(pa.array(col, from_pandas=True))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            arrays.append(pa.array(col.map(_cell_to_str).where(col.notna(), None), type=pa.string()))
+    
+    return pa.table(arrays, names=[str(c) for c in df.columns])
+
+
+def _table_to_csv_bytes(table):
+    """
+    Write an Arrow table to UTF-8 CSV bytes.
+    
+    Timestamps are written as dates when every value is midnight and to the
+    second otherwise, and booleans, durations and times are written as the
+    text pandas used (True, 0 days 05:00:00, 05:00:00), matching how pandas
+    formatted them. Other values use Arrow's CSV format, which differs from
+    pandas' to_csv in two ways that do not change the parsed data: the
+    header and every text value are quoted, and whole-number floats are
+    written without ".0" (100, not 100.0).
+    
+    Args:
+        table (pa.Table): Data to serialize
+    
+    Returns:
+        bytes: CSV file contents including the header row
+    """
+    for i, field in enumerate(table.schema):
+        if pa.types.is_timestamp(field.type):
+            col = table.column(i)
+            all_midnight = pc.all(pc.equal(pc.floor_temporal(col, unit='day'), col)).as_py()
+            target = pa.date32() if all_midnight is not False else pa.timestamp('s')
+            table = table.set_column(i, field.name, col.cast(target, safe=False))
+        elif pa.types.is_boolean(field.type):
+            # Arrow writes true/false
+            table = table.set_column(i, field.name, pc.if_else(table.column(i), "True", "False"))
+        elif pa.types.is_duration(field.type) or pa.types.is_time(field.type):
+            # Arrow writes durations as integer counts and times with a
+            # fractional part; these columns are rare, so format in pandas
+            values = table.column(i).to_pandas()
+            text = values.astype(str).where(values.notna(), None)
+            table = table.set_column(i, field.name, pa.array(text, type=pa.string()))
+    
+    sink = pa.BufferOutputStream()
+    pacsv.write_csv(table, sink, write_options=pacsv.WriteOptions(include_header=True))
+    return sink.getvalue().to_pybytes()
+
+
+def _downcast_frame(df, max_unique_ratio=0.5, exclude=AMOUNT_COLUMNS):
+    """
+    Shrink a DataFrame's memory in place before it is serialized.
+    
+    Integer columns are narrowed to the smallest integer type that holds
+    their values, and text columns with mostly repeated values become
+    categoricals. Only columns holding strings are categorized: an
+    all-blank column arrives as object dtype too, and as a categorical
+    it would break the arithmetic done on it. Floats are left as float64:
+    they hold amounts, and float32 would change the written values.
+    
+    Args:
+        df (pd.DataFrame): Data to shrink (modified in place)
+        max_unique_ratio (float): Largest distinct/total ratio for a text
+            column to become categorical
+        exclude (iterable): Columns never made categorical
+    
+    Returns:
+        pd.DataFrame: The same DataFrame
+    """
+    for col in df.columns:
+        values = df[col]
+        if pd.api.types.is_integer_dtype(values.dtype):
+            df[col] = pd.to_numeric(values, downcast='integer')
+        elif (
+            values.dtype == object
+            and col not in exclude
+            and pd.api.types.infer_dtype(values, skipna=True) == 'string'
+            and values.nunique() / len(values) < max_unique_ratio
+        ):
+            df[col] = values.astype('category')
+    return df
+
+
+def _table_head_to_ipc(table, num_rows=PREVIEW_ROWS):
+    """
+    Serialize the first rows of an Arrow table as an Arrow IPC (Feather) file.
+    
+    Previews load this with full column types and no CSV parsing.
+    
+    Args:
+        table (pa.Table): Report data
+        num_rows (int): Number of rows to keep
+    
+    Returns:
+        bytes: Arrow IPC file contents
+    """
+    head = table.slice(0, num_rows)
+    
+    # A sliced dictionary column still carries every category; store values
+    for i, field in enumerate(head.schema):
+        if pa.types.is_dictionary(field.type):
+            head = head.set_column(i, field.name, head.column(i).cast(field.type.value_type))
+    
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, head.schema) as writer:
+        writer.write_table(head)
+    return sink.getvalue().to_pybytes()
+
+
 def save_reports_to_csv(combined_df, processed_df, ProcessedDetailed_df, from_date, to_date):
     import io
     import pandas as pd
@@ -216,12 +618,9 @@ def save_reports_to_csv(combined_df, processed_df, ProcessedDetailed_df, from_da
 
     reports = {}
 
-    def write_df(df):
-        return df.to_csv(index=False).encode('utf-8')
-
-    reports[f"Combined_PO_Report_{from_clean}_to_{to_clean}_{date_str}.csv"] = write_df(combined_df)
-    reports[f"Processed_PO_Report_{from_clean}_to_{to_clean}_{date_str}.csv"] = write_df(processed_df)
-    reports[f"ProcessedDetailed_PO_Report_{from_clean}_to_{to_clean}_{date_str}.csv"] = write_df(ProcessedDetailed_df)
+    reports[f"Combined_PO_Report_{from_clean}_to_{to_clean}_{date_str}.csv"] = _df_to_csv_bytes(combined_df)
+    reports[f"Processed_PO_Report_{from_clean}_to_{to_clean}_{date_str}.csv"] = _df_to_csv_bytes(processed_df)
+    reports[f"ProcessedDetailed_PO_Report_{from_clean}_to_{to_clean}_{date_str}.csv"] = _df_to_csv_bytes(ProcessedDetailed_df)
 
     return reports
 
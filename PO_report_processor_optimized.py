@@ -3,11 +3,21 @@ PO Report Processor - Memory Optimized Version
 Processes raw PO reports from Oracle BIP with minimal memory footprint
 """
 
-import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import io
-import gc
+from PO_report_processor import (
+    _conversion_rate,
+    _df_to_table,
+    _downcast_frame,
+    _grn_amount_in_sar,
+    _group_cumcount,
+    _read_excel_sheets,
+    _table_head_to_ipc,
+    _table_to_csv_bytes,
+)
 
 
 def process_po_report_streaming(excel_data, from_date="01-01-2024", to_date=datetime.now().strftime("%d-%m-%Y")):
@@ -16,110 +26,72 @@ def process_po_report_streaming(excel_data, from_date="01-01-2024", to_date=date
     Returns file data as bytes instead of storing DataFrames in memory.
     
     Args:
-        excel_data (bytes): Raw Excel file data (.xls format with multiple sheets)
+        excel_data (bytes or str): Raw Excel file data (.xls format with multiple sheets),
+            or a path to the Excel file
         from_date (str): Start date of the report (MM-DD-YYYY)
         to_date (str): End date of the report (MM-DD-YYYY)
     
     Returns:
-        dict: Dictionary with filenames as keys and CSV bytes as values
+        dict: CSV bytes under 'combined', 'processed' and 'detailed', plus
+            'previews': the same keys mapped to the first rows of each report
+            as Arrow IPC (Feather) bytes, and
+            'meta': the same keys mapped to {'rows': ..., 'cols': ...}
     """
     
-    # Process in chunks and immediately convert to CSV to save memory
+    # Parse once and immediately convert each report to CSV to save memory
     reports = {}
+    previews = {}
+    meta = {}
     
-    # Step 1: Combine sheets and save immediately
-    combined_csv = _combine_excel_sheets_streaming(excel_data, from_date, to_date)
-    reports['combined'] = combined_csv
+    # Step 1: Combine sheets
+    combined_table, combined_report = _combine_excel_sheets_streaming(excel_data, from_date, to_date)
     
-    # Step 2: Process aggregated report from CSV (not from DataFrame)
-    processed_csv = _create_processed_report_streaming(combined_csv, from_date, to_date)
-    reports['processed'] = processed_csv
-    
-    # Step 3: Process detailed report from CSV
-    detailed_csv = _create_detailed_report_streaming(combined_csv, from_date, to_date)
-    reports['detailed'] = detailed_csv
-    
-    # Force garbage collection
-    gc.collect()
+    # Writing the Combined CSV and steps 2 and 3 only read immutable Arrow
+    # tables, so run all three in parallel (Arrow's CSV writer releases the GIL)
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        combined_future = executor.submit(_encode_report, combined_report)
+        
+        # Step 2: Process aggregated report (aggregated in Arrow)
+        processed_future = executor.submit(_create_processed_report_streaming, combined_table, from_date, to_date)
+        
+        # Step 3: Process detailed report
+        detailed_future = executor.submit(_create_detailed_report_streaming, combined_table, from_date, to_date)
+        
+        reports['combined'], previews['combined'], meta['combined'] = combined_future.result()
+        reports['processed'], previews['processed'], meta['processed'] = processed_future.result()
+        reports['detailed'], previews['detailed'], meta['detailed'] = detailed_future.result()
     
+    reports['previews'] = previews
+    reports['meta'] = meta
     return reports
 
 
 def _combine_excel_sheets_streaming(excel_data, from_date, to_date):
     """
-    Combine all sheets from Excel file and return as CSV bytes.
-    Processes sheets one at a time to minimize memory usage.
+    Combine all sheets from Excel file.
+    Returns the combined data as an Arrow table (without metadata columns)
+    for the downstream reports, plus the Combined report table (with them).
     """
-    xls = pd.ExcelFile(io.BytesIO(excel_data))
-    sheet_names = xls.sheet_names
-    
-    # Read first sheet to get column template
-    df_first = pd.read_excel(xls, sheet_name=sheet_names[0], header=0)
-    df_first.columns = df_first.columns.str.strip()
-    columns_template = df_first.columns
+    table = _read_excel_sheets(excel_data)
     
     # Add metadata
     generation_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    df_first.insert(0, 'Report Type', 'Combined')
-    df_first.insert(1, 'Date Range', f'{from_date} to {to_date}')
-    df_first.insert(2, 'Generation Date', generation_date)
-    
-    # Write first sheet to CSV buffer
-    output = io.StringIO()
-    df_first.to_csv(output, index=False)
+    num_rows = table.num_rows
+    combined = table.add_column(0, 'Report Type', pa.repeat('Combined', num_rows))
+    combined = combined.add_column(1, 'Date Range', pa.repeat(f'{from_date} to {to_date}', num_rows))
+    combined = combined.add_column(2, 'Generation Date', pa.repeat(generation_date, num_rows))
     
-    # Clear first dataframe from memory
-    del df_first
-    gc.collect()
-    
-    # Process remaining sheets one at a time
-    for sheet in sheet_names[1:]:
-        df = pd.read_excel(xls, sheet_name=sheet, header=None)
-        
-        # Skip if column mismatch
-        if df.shape[1] != len(columns_template):
-            del df
-            continue
-        
-        df.columns = columns_template
-        
-        # Add metadata
-        df.insert(0, 'Report Type', 'Combined')
-        df.insert(1, 'Date Range', f'{from_date} to {to_date}')
-        df.insert(2, 'Generation Date', generation_date)
-        
-        # Append to CSV (without header)
-        df.to_csv(output, index=False, header=False)
-        
-        # Clear dataframe from memory
-        del df
-        gc.collect()
-    
-    # Get CSV bytes
-    csv_bytes = output.getvalue().encode('utf-8')
-    output.close()
-    
-    return csv_bytes
+    return table, combined
 
 
-def _create_processed_report_streaming(combined_csv, from_date, to_date):
+def _create_processed_report_streaming(combined_table, from_date, to_date):
     """
-    Create processed report from CSV data with chunked processing.
+    Create processed report from the combined Arrow table.
+    The group-by sum runs as an Arrow hash aggregate; the small
+    aggregated result is finished in pandas.
+    Returns the report as CSV bytes, its preview as Arrow IPC bytes and
+    its size.
     """
-    # Read CSV in chunks to reduce memory
-    chunk_size = 10000
-    chunks = []
-    
-    for chunk in pd.read_csv(io.BytesIO(combined_csv), chunksize=chunk_size):
-        # Remove metadata columns
-        chunk = chunk.drop(columns=['Report Type', 'Date Range', 'Generation Date'])
-        chunks.append(chunk)
-    
-    # Combine chunks
-    df = pd.concat(chunks, ignore_index=True)
-    del chunks
-    gc.collect()
-    
     # Define grouping keys and numeric columns
     keys = [
         'Po Number',
@@ -139,29 +111,37 @@ def _create_processed_report_streaming(combined_csv, from_date, to_date):
     ]
     
     # Fill NaN values
-    df[keys] = df[keys].fillna(0)
-    df[num] = df[num].fillna(0)
+    table = combined_table.select(keys + num)
+    for i, name in enumerate(table.column_names):
+        table = table.set_column(i, name, _fill_null_zero(table.column(i)))
+    
+    # Group and sum; order groups by all keys (as groupby(keys) did), then by PO
+    summ = (
+        table.group_by(keys)
+        .aggregate([(c, 'sum') for c in num])
+        .select(keys + [f'{c}_sum' for c in num])
+        .rename_columns(keys + num)
+        .sort_by([(k, 'ascending') for k in keys])
+        .to_pandas()
+    )
     
-    # Group and sum
-    summ = df.groupby(keys)[num].sum().reset_index().sort_values(by=keys[0])
+    # Categorical PO numbers: the sort and the isin below work on int codes
+    summ['Po Number'] = summ['Po Number'].astype('category')
+    summ = summ.sort_values(by=keys[0], kind='stable')
     
-    # Clear original df
-    del df
-    gc.collect()
+    # Clear original table
+    del table
     
     # Calculate conversion rate
-    summ['conversion rate'] = np.where(
-        (summ['Amount in Functional Currency'] == 0) & (summ['Amount in transaction Currency'] == 0),
-        1,
-        summ['Amount in Functional Currency'] / summ['Amount in transaction Currency']
+    summ['conversion rate'] = _conversion_rate(
+        summ['Amount in Functional Currency'],
+        summ['Amount in transaction Currency']
     )
     
     # Handle duplicates
     key_cols = ['Po Number', 'Invoice Number', 'Invoice Line Number']
-    summ['dup_index'] = summ.groupby(key_cols).cumcount()
-    mask = summ['dup_index'] > 0
+    mask = _group_cumcount(summ, key_cols) > 0
     summ.loc[mask, ['Line Amount', 'Line Maount in Functional Currency']] = 0
-    summ = summ.drop(columns='dup_index')
     
     # Calculate differences
     summ['diff'] = summ['Line Amount'] - summ['Amount Received']
@@ -176,33 +156,30 @@ def _create_processed_report_streaming(combined_csv, from_date, to_date):
     summ.insert(1, 'Date Range', f'{from_date} to {to_date}')
     summ.insert(2, 'Generation Date', generation_date)
     
-    # Convert to CSV bytes
-    csv_bytes = summ.to_csv(index=False).encode('utf-8')
-    
-    # Clear dataframe
-    del summ
-    gc.collect()
-    
-    return csv_bytes
+    # Convert to CSV bytes and preview
+    return _encode_report(_df_to_table(summ))
 
 
-def _create_detailed_report_streaming(combined_csv, from_date, to_date):
+def _fill_null_zero(column):
     """
-    Create detailed report from CSV data with chunked processing.
+    Replace nulls in an Arrow column with zero ("0" for text columns).
     """
-    # Read CSV in chunks
-    chunk_size = 10000
-    chunks = []
-    
-    for chunk in pd.read_csv(io.BytesIO(combined_csv), chunksize=chunk_size):
-        # Remove metadata columns
-        chunk = chunk.drop(columns=['Report Type', 'Date Range', 'Generation Date'])
-        chunks.append(chunk)
+    if pa.types.is_null(column.type):
+        column = column.cast(pa.int64())
+    fill_value = "0" if pa.types.is_string(column.type) else 0
+    return pc.fill_null(column, fill_value)
+
+
+def _create_detailed_report_streaming(combined_table, from_date, to_date):
+    """
+    Create detailed report from the combined Arrow table.
+    Returns the report as CSV bytes, its preview as Arrow IPC bytes and
+    its size.
+    """
+    df = combined_table.to_pandas()
     
-    # Combine chunks
-    df = pd.concat(chunks, ignore_index=True)
-    del chunks
-    gc.collect()
+    # Narrow integers and categorize repeated text before building on it
+    _downcast_frame(df)
     
     # Identify duplicates
     df["Dup_ind"] = df.groupby([
@@ -210,7 +187,7 @@ def _create_detailed_report_streaming(combined_csv, from_date, to_date):
         "Invoice Number",
         "Invoice Line Number",
         "Line Amount"
-    ]).cumcount() + 1
+    ], observed=True).cumcount() + 1
     
     # Create adjusted amounts
     df["Line_amount_adj"] = np.where(df["Dup_ind"] > 1, 0, df["Line Amount"])
@@ -225,9 +202,11 @@ def _create_detailed_report_streaming(combined_csv, from_date, to_date):
     
     # Calculate amounts in SAR
     df['Amount_recieved_in_SAR'] = df['Amount Received'] * df['conversion_rate']
-    df['GRN_amount_in_SAR'] = (
-        df['Amount Received'].fillna(0) - df["Line_amount_adj"].fillna(0)
-    ) * df["conversion_rate"]
+    df['GRN_amount_in_SAR'] = _grn_amount_in_sar(
+        df['Amount Received'],
+        df["Line_amount_adj"],
+        df["conversion_rate"]
+    )
     
     # Add metadata
     generation_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -235,14 +214,18 @@ def _create_detailed_report_streaming(combined_csv, from_date, to_date):
     df.insert(1, 'Date Range', f'{from_date} to {to_date}')
     df.insert(2, 'Generation Date', generation_date)
     
-    # Convert to CSV bytes
-    csv_bytes = df.to_csv(index=False).encode('utf-8')
-    
-    # Clear dataframe
-    del df
-    gc.collect()
-    
-    return csv_bytes
+    # Convert to CSV bytes and preview
+    return _encode_report(_df_to_table(df))
+
+
+def _encode_report(table):
+    """
+    Serialize a finished report table for the app.
+    Returns the report as CSV bytes, its preview as Arrow IPC bytes and
+    its size as {'rows': ..., 'cols': ...}.
+    """
+    size = {'rows': table.num_rows, 'cols': table.num_columns}
+    return _table_to_csv_bytes(table), _table_head_to_ipc(table), size
 
 
 def save_reports_streaming(reports_dict, from_date, to_date):
@@ -255,16 +238,16 @@ def save_reports_streaming(reports_dict, from_date, to_date):
         to_date: End date
     
     Returns:
-        dict: Filenames mapped to CSV bytes
+        dict: 'combined', 'processed' and 'detailed' mapped to (filename, CSV bytes)
     """
     date_str = datetime.now().strftime("%Y%m%d_%H%M%S")
     from_clean = from_date.replace('-', '')
     to_clean = to_date.replace('-', '')
     
     return {
-        f"Combined_PO_Report_{from_clean}_to_{to_clean}_{date_str}.csv": reports_dict['combined'],
-        f"Processed_PO_Report_{from_clean}_to_{to_clean}_{date_str}.csv": reports_dict['processed'],
-        f"ProcessedDetailed_PO_Report_{from_clean}_to_{to_clean}_{date_str}.csv": reports_dict['detailed']
+        'combined': (f"Combined_PO_Report_{from_clean}_to_{to_clean}_{date_str}.csv", reports_dict['combined']),
+        'processed': (f"Processed_PO_Report_{from_clean}_to_{to_clean}_{date_str}.csv", reports_dict['processed']),
+        'detailed': (f"ProcessedDetailed_PO_Report_{from_clean}_to_{to_clean}_{date_str}.csv", reports_dict['detailed'])
     }
 
 
@@ -273,6 +256,6 @@ if __name__ == "__main__":
     print("=" * 80)
     print("This version processes reports with minimal memory footprint")
     print("- Streams data instead of loading all at once")
-    print("- Processes in chunks")
+    print("- Parses the Excel file once into a shared Arrow table")
     print("- Immediately converts to CSV")
-    print("- Forces garbage collection")
+    print("- Frees intermediate data as soon as it goes out of scope")
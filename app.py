@@ -4,13 +4,22 @@ Web interface for scheduling and downloading PO reports from Oracle BI Publisher
 """
 
 import streamlit as st
+import atexit
 import datetime
-import io
+import functools
+import gzip
+import hashlib
 import os
-import pandas as pd
-import gc
-from PO_report_fetcher import run_po_report, download_po_report, DEFAULT_FROM_DATE
-from PO_report_processor_optimized import process_po_report_streaming, save_reports_streaming
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from PO_report_fetcher import run_po_report_to_file, download_po_report_to_file, get_bip_session, DEFAULT_FROM_DATE
+
+# pandas, pyarrow and the report processor are imported where they are used,
+# so the login page and cold starts do not pay for loading them
 
 # Page configuration
 st.set_page_config(
@@ -54,6 +63,454 @@ def check_password():
 if not check_password():
     st.stop()
 
+# -------------------------------
+# ORACLE BIP CONNECTION
+# -------------------------------
+@st.cache_resource
+def _warm_bip_session():
+    """
+    Build the Oracle BIP client and its pooled session once per server
+    process, in the background, so the first Schedule or Download click
+    does not wait for the WSDL load and TLS handshake.
+    
+    Returns:
+        threading.Thread: The warm-up thread
+    """
+    def connect():
+        try:
+            get_bip_session()
+        except Exception as e:
+            print(f"Warning: Could not pre-connect to Oracle BIP: {e}")
+    
+    thread = threading.Thread(target=connect, daemon=True)
+    thread.start()
+    return thread
+
+_warm_bip_session()
+
+# -------------------------------
+# REPORT PROCESSING
+# -------------------------------
+def _file_digest(path):
+    """
+    Hash a raw report file so identical downloads share a processing key.
+    
+    Args:
+        path (str): Path of the raw report
+    
+    Returns:
+        str: Hex BLAKE2b digest of the file contents
+    """
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, lambda: hashlib.blake2b(digest_size=16)).hexdigest()
+
+
+# Processed reports kept for reuse, as gzip temp files; only their paths,
+# previews and sizes are held in memory
+PROCESSED_CACHE_ENTRIES = 2
+
+
+@st.cache_resource
+def _processed_reports():
+    """
+    Cache of processed reports, shared by all sessions of this server
+    process and keyed on (file digest, from date, to date).
+    
+    Returns:
+        dict: 'lock' and 'entries', an OrderedDict from least to most
+            recently used of {'report_files': ..., 'previews': ..., 'meta': ...}
+    """
+    return {'lock': threading.Lock(), 'entries': OrderedDict()}
+
+
+def _process_report(raw_path, from_date, to_date, registry, cache):
+    """
+    Process a raw report into gzip temp files, reusing an earlier result
+    for the same file contents and date range.
+    
+    Downloading the same report twice (e.g. clicking Download again for
+    the same Job ID) copies the cached report files instead of processing
+    it again. Only the PROCESSED_CACHE_ENTRIES most recent results are
+    kept; the files of older ones are deleted. Uses no Streamlit state, so
+    it can run in a background job.
+    
+    Args:
+        raw_path (str): Path of the raw report
+        from_date (str): Start date of the report
+        to_date (str): End date of the report
+        registry (set): Report temp file registry from _report_files()
+        cache (dict): Processed report cache from _processed_reports()
+    
+    Returns:
+        dict: 'report_files' (report kinds mapped to (filename, path) of
+            temp files owned by the caller), 'previews' and 'meta'
+    """
+    key = (_file_digest(raw_path), from_date, to_date)
+    
+    with cache['lock']:
+        entry = cache['entries'].get(key)
+        if entry is not None:
+            cache['entries'].move_to_end(key)
+            return dict(entry, report_files=_copy_report_files(entry['report_files'], registry))
+    
+    from PO_report_processor_optimized import process_po_report_streaming, save_reports_streaming
+    
+    # Process the report using streaming (memory optimized)
+    reports_dict = process_po_report_streaming(raw_path, from_date, to_date)
+    
+    # Format filenames and spill the CSVs to disk straight away
+    reports = save_reports_streaming(reports_dict, from_date, to_date)
+    entry = {
+        'report_files': _write_report_files(reports, registry),
+        'previews': reports_dict['previews'],
+        'meta': reports_dict['meta']
+    }
+    del reports_dict, reports
+    
+    with cache['lock']:
+        evicted = [cache['entries'].pop(key, None)]
+        cache['entries'][key] = entry
+        while len(cache['entries']) > PROCESSED_CACHE_ENTRIES:
+            evicted.append(cache['entries'].popitem(last=False)[1])
+        result = dict(entry, report_files=_copy_report_files(entry['report_files'], registry))
+    
+    for old_entry in filter(None, evicted):
+        old_paths = [path for _, path in old_entry['report_files'].values()]
+        _remove_files(old_paths)
+        registry.difference_update(old_paths)
+    
+    return result
+
+
+# -------------------------------
+# REPORT PREVIEW
+# -------------------------------
+@st.cache_data(show_spinner=False, max_entries=32)
+def _preview(head_ipc):
+    """
+    Load the first rows of a report for preview.
+    
+    Cached on the preview bytes, so reruns (tab switches, widget changes)
+    do not load them again.
+    
+    Args:
+        head_ipc (bytes): First rows of the report as Arrow IPC (Feather)
+            bytes, from process_po_report_streaming
+    
+    Returns:
+        pd.DataFrame: Preview rows with their column types
+    """
+    import pyarrow as pa
+    
+    # Typed preview rows straight from Arrow, without parsing any CSV
+    return pa.ipc.open_file(pa.py_buffer(head_ipc)).read_all().to_pandas()
+
+
+def _render_preview(previews, meta, kind):
+    """
+    Show the size and first rows of one report.
+    
+    The preview frame is local to this function, so it is released by
+    reference counting as soon as the function returns.
+    
+    Args:
+        previews (dict): Preview bytes by report kind, from process_po_report_streaming
+        meta (dict): {'rows': ..., 'cols': ...} by report kind
+        kind (str): 'combined', 'processed' or 'detailed'
+    """
+    df = _preview(previews[kind])
+    st.info(f"**Rows:** {meta[kind]['rows']:,} | **Columns:** {meta[kind]['cols']}")
+    st.dataframe(df, use_container_width=True)
+
+
+# -------------------------------
+# REPORT FILES
+# -------------------------------
+@st.cache_resource
+def _report_files():
+    """
+    Track the report temp files written by this server process.
+    
+    Created once per process; files still listed are deleted at exit.
+    
+    Returns:
+        set: Paths of report temp files
+    """
+    paths = set()
+    atexit.register(_remove_files, paths)
+    return paths
+
+
+def _remove_files(paths):
+    """Delete the given files, ignoring any that are already gone."""
+    for path in list(paths):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+# A session's report files are deleted once no run of it has touched them
+# for this long (e.g. its browser tab was closed)
+REPORT_FILE_TTL = 3600  # seconds
+
+# Session state keys holding {kind: (filename, path)} report files, with the
+# keys of their previews and sizes
+PROCESSED_REPORT_KEYS = {
+    'processed_reports': ('processed_previews', 'processed_reports_meta'),
+    'processed_reports_tab2': ('processed_previews_tab2', 'processed_reports_meta_tab2'),
+}
+
+
+def _keep_report_files():
+    """
+    Mark the current session's report files as in use and prune the report
+    files of sessions that are gone.
+    
+    Every run touches the session's files. Files no run has touched for
+    REPORT_FILE_TTL are deleted (files owned by the processed report cache
+    are managed by the cache). Processed reports of this session whose
+    files were pruned are dropped from session state.
+    """
+    for key in ('last_file_path', 'last_download_path'):
+        path = st.session_state.get(key)
+        if path:
+            _touch_file(path)
+    
+    for key, related_keys in PROCESSED_REPORT_KEYS.items():
+        files = st.session_state.get(key)
+        if files and not all([_touch_file(path) for _, path in files.values()]):
+            for stale_key in (key,) + related_keys:
+                st.session_state.pop(stale_key, None)
+    
+    _prune_report_files()
+
+
+def _touch_file(path):
+    """Update a file's modification time; returns False if it is gone."""
+    try:
+        os.utime(path)
+        return True
+    except OSError:
+        return False
+
+
+def _prune_report_files():
+    """
+    Delete report temp files not touched for REPORT_FILE_TTL, except those
+    owned by the processed report cache.
+    """
+    registry = _report_files()
+    cache = _processed_reports()
+    with cache['lock']:
+        cached = {path for entry in cache['entries'].values() for _, path in entry['report_files'].values()}
+    
+    cutoff = time.time() - REPORT_FILE_TTL
+    for path in list(registry - cached):
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.unlink(path)
+                registry.discard(path)
+        except FileNotFoundError:
+            registry.discard(path)
+        except OSError:
+            pass
+
+_keep_report_files()
+
+
+def _read_file(path):
+    """
+    Read a report file for a download button (called on click).
+    
+    The file is read with one unbuffered call and .gz files are inflated
+    in one pass, instead of through 8 KB buffered and streamed reads.
+    """
+    with open(path, 'rb', buffering=0) as f:
+        data = f.readall()
+    return gzip.decompress(data) if path.endswith('.gz') else data
+
+
+def _new_report_file(state_key, suffix):
+    """
+    Create an empty temp file for a downloaded report and keep its path in
+    session state, deleting the file previously stored under `state_key`.
+    
+    Args:
+        state_key (str): Session state key for the path
+        suffix (str): File name suffix, e.g. '.xls'
+    
+    Returns:
+        str: Path of the new temp file
+    """
+    registry = _report_files()
+    
+    old_path = st.session_state.get(state_key)
+    if old_path:
+        _remove_files([old_path])
+        registry.discard(old_path)
+    
+    with tempfile.NamedTemporaryFile(delete=False, prefix="po_report_", suffix=suffix) as f:
+        path = f.name
+    registry.add(path)
+    st.session_state[state_key] = path
+    return path
+
+
+def _write_report_files(reports, registry):
+    """
+    Write report CSVs to gzip-compressed temp files.
+    
+    CSV compresses several times over even at the fastest level, which
+    matters where the temp directory is held in memory. Files are
+    decompressed only for a download.
+    
+    Args:
+        reports (dict): Report kinds mapped to (filename, CSV bytes),
+            from save_reports_streaming
+        registry (set): Report temp file registry from _report_files()
+    
+    Returns:
+        dict: Report kinds mapped to (filename, temp file path)
+    """
+    # Compress the reports in parallel; zlib releases the GIL
+    with ThreadPoolExecutor(max_workers=len(reports) or 1) as executor:
+        paths = list(executor.map(_write_gzip_temp, [data for _, data in reports.values()]))
+    registry.update(paths)
+    return {kind: (filename, path) for (kind, (filename, _)), path in zip(reports.items(), paths)}
+
+
+def _store_report_files(paths, state_key):
+    """
+    Keep report file paths in session state, deleting the files of the
+    reports previously stored under `state_key`.
+    
+    Args:
+        paths (dict): Report kinds mapped to (filename, temp file path)
+        state_key (str): Session state key for the {kind: (filename, path)} dict
+    """
+    old_paths = [path for _, path in st.session_state.get(state_key, {}).values()]
+    _remove_files(old_paths)
+    _report_files().difference_update(old_paths)
+    
+    st.session_state[state_key] = paths
+
+
+def _copy_report_files(files, registry):
+    """
+    Copy report temp files to new temp files.
+    
+    Args:
+        files (dict): Report kinds mapped to (filename, temp file path)
+        registry (set): Report temp file registry from _report_files()
+    
+    Returns:
+        dict: Report kinds mapped to (filename, path of the copy)
+    """
+    copies = {}
+    for kind, (filename, path) in files.items():
+        with open(path, 'rb') as src, tempfile.NamedTemporaryFile(delete=False, prefix="po_report_", suffix=".csv.gz") as f:
+            shutil.copyfileobj(src, f)
+        copies[kind] = (filename, f.name)
+    registry.update(path for _, path in copies.values())
+    return copies
+
+
+def _write_gzip_temp(data):
+    """
+    Write bytes to a new gzip-compressed temp file.
+    
+    Args:
+        data (bytes): File contents
+    
+    Returns:
+        str: Path of the temp file
+    """
+    with tempfile.NamedTemporaryFile(delete=False, prefix="po_report_", suffix=".csv.gz") as f:
+        f.write(gzip.compress(data, compresslevel=1))
+    return f.name
+
+
+# -------------------------------
+# BACKGROUND JOBS
+# -------------------------------
+SCHEDULE_JOB_POLL_SECONDS = 5
+
+
+@st.cache_resource
+def _job_executor():
+    """
+    Thread pool for Schedule & Download jobs, shared by all sessions of
+    this server process.
+    
+    A job waits on Oracle BIP for up to 20 minutes; running it here lets
+    each script run finish straight away instead of holding its thread
+    for the whole wait. Jobs run one at a time and later ones queue, so
+    only one report is downloaded and processed in memory at once.
+    
+    Returns:
+        ThreadPoolExecutor: The job executor
+    """
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="po_report_job")
+
+
+def _schedule_and_process(raw_path, to_date_str, process_report, registry, cache, progress):
+    """
+    Schedule the PO report, download it to `raw_path` and optionally
+    process it. Runs on the job executor, outside any script run, so it
+    reports progress through `progress` and returns its results instead
+    of touching session state.
+    
+    Args:
+        raw_path (str): Temp file to write the raw report to
+        to_date_str (str): End date of the report (MM-DD-YYYY)
+        process_report (bool): Whether to generate the 3 processed reports
+        registry (set): Report temp file registry from _report_files()
+        cache (dict): Processed report cache from _processed_reports()
+        progress (dict): Current step under 'text', updated as the job runs
+    
+    Returns:
+        dict: 'job_id' and 'file_size', plus 'report_files', 'previews' and
+            'meta' when the report was processed
+    """
+    progress['text'] = "Step 1/2: Scheduling report with Oracle BIP and waiting for completion..."
+    job_id = run_po_report_to_file(raw_path, to_date=to_date_str)
+    result = {'job_id': job_id, 'file_size': os.path.getsize(raw_path)}
+    
+    if process_report:
+        progress['text'] = f"Step 2/2: Report downloaded (Job ID: {job_id}). Processing report (generating 3 files)..."
+        
+        # Process the report (cached on contents); returns ONLY temp file paths, not the CSV data!
+        result.update(_process_report(raw_path, DEFAULT_FROM_DATE, to_date_str, registry, cache))
+    
+    return result
+
+
+@st.fragment(run_every=SCHEDULE_JOB_POLL_SECONDS)
+def _schedule_job_status():
+    """
+    Show the progress of the running Schedule & Download job.
+    
+    Reruns on its own every few seconds without rerunning the rest of the
+    app, and triggers a full rerun once the job is done so its results
+    are picked up.
+    """
+    job = st.session_state.get('schedule_job')
+    if job is None:
+        return
+    if job['future'].done():
+        st.rerun()
+    
+    # Keep the raw report file alive through a long wait on Oracle
+    _keep_report_files()
+    
+    elapsed = datetime.datetime.now() - job['started']
+    with st.status("Waiting on Oracle...", expanded=True):
+        st.write(job['progress']['text'])
+        st.caption(f"Running for {int(elapsed.total_seconds()) // 60} min {int(elapsed.total_seconds()) % 60} s. "
+                   "You can keep using the other tab meanwhile.")
+
+
 # Header
 st.title("📊 PO GRN Report Fetcher & Processor")
 st.markdown("Oracle BI Publisher - Purchase Order GRN Report Management & Processing")
@@ -117,116 +574,102 @@ with tab1:
             **Expected Processing Time:** 15-20 minutes
             """)
     
-    # Run button
-    if st.button("🚀 Schedule & Download Report", type="primary", use_container_width=True):
+    # Pick up the result of a finished Schedule & Download job
+    job = st.session_state.get('schedule_job')
+    if job is not None and job['future'].done():
+        del st.session_state['schedule_job']
         try:
-            # Create progress placeholder
-            progress_text = st.empty()
-            progress_bar = st.progress(0)
-            
-            progress_text.text("Step 1/4: Scheduling report with Oracle BIP...")
-            progress_bar.progress(10)
-            
-            # Schedule and download
-            job_id, file_data = run_po_report(to_date=to_date_str)
-            
-            progress_text.text(f"Step 2/4: Report scheduled (Job ID: {job_id}). Waiting for completion...")
-            progress_bar.progress(50)
-            
-            progress_text.text("Step 3/4: Downloading report data...")
-            progress_bar.progress(70)
+            result = job['future'].result()
+        except Exception as e:
+            st.error(f"❌ Error: {str(e)}")
+            st.exception(e)
+        else:
+            job_id = result['job_id']
+            file_size = result['file_size']
             
             # Success message for raw download
             st.success(f"""
             ✅ **Report Downloaded Successfully!**
             - **Job ID:** {job_id}
-            - **File Size:** {len(file_data):,} bytes ({len(file_data) / 1024 / 1024:.2f} MB)
-            - **Date Range:** {DEFAULT_FROM_DATE} to {to_date_str}
+            - **File Size:** {file_size:,} bytes ({file_size / 1024 / 1024:.2f} MB)
+            - **Date Range:** {DEFAULT_FROM_DATE} to {job['to_date']}
             """)
             
             # Store in session state
             st.session_state['last_job_id'] = job_id
-            st.session_state['last_file_data'] = file_data
-            st.session_state['last_to_date'] = to_date_str
+            st.session_state['last_to_date'] = job['to_date']
             st.session_state['last_from_date'] = DEFAULT_FROM_DATE
             
-            if process_report:
-                progress_text.text("Step 4/4: Processing report (generating 3 files)...")
-                progress_bar.progress(80)
-                
-                # Process the report using streaming (memory optimized)
-                reports_dict = process_po_report_streaming(
-                    file_data,
-                    DEFAULT_FROM_DATE,
-                    to_date_str
-                )
-                
-                progress_bar.progress(90)
-                
-                # Format filenames
-                reports = save_reports_streaming(
-                    reports_dict,
-                    DEFAULT_FROM_DATE,
-                    to_date_str
-                )
-                
-                progress_bar.progress(100)
-                progress_text.empty()
-                progress_bar.empty()
-                
-                # Store ONLY CSV bytes in session state (not DataFrames!)
-                st.session_state['processed_reports'] = reports
-                
-                # Clear the reports_dict to free memory
-                del reports_dict
-                gc.collect()
+            if 'report_files' in result:
+                _store_report_files(result['report_files'], 'processed_reports')
+                st.session_state['processed_previews'] = result['previews']
+                st.session_state['processed_reports_meta'] = result['meta']
                 
                 st.success("✅ All reports processed successfully!")
                 
             else:
                 # Just provide raw file download
-                progress_bar.progress(100)
-                progress_text.empty()
-                progress_bar.empty()
-                
-                filename = f"PO_Report_Raw_{to_date_str.replace('-', '')}_{job_id}.xls"
+                filename = f"PO_Report_Raw_{job['to_date'].replace('-', '')}_{job_id}.xls"
                 st.download_button(
                     label="⬇️ Download Raw Excel File",
-                    data=file_data,
+                    data=functools.partial(_read_file, job['raw_path']),
                     file_name=filename,
                     mime="application/vnd.ms-excel",
                     use_container_width=True
                 )
-            
-        except Exception as e:
-            st.error(f"❌ Error: {str(e)}")
-            st.exception(e)
+    
+    # Run button (disabled while a job is running)
+    if st.button("🚀 Schedule & Download Report", type="primary", use_container_width=True,
+                 disabled='schedule_job' in st.session_state):
+        # Schedule and download (written to a temp file as it arrives) in the background
+        raw_path = _new_report_file('last_file_path', '.xls')
+        progress = {'text': "Queued: waiting for another report to finish..."}
+        future = _job_executor().submit(
+            _schedule_and_process,
+            raw_path,
+            to_date_str,
+            process_report,
+            _report_files(),
+            _processed_reports(),
+            progress
+        )
+        st.session_state['schedule_job'] = {
+            'future': future,
+            'progress': progress,
+            'raw_path': raw_path,
+            'to_date': to_date_str,
+            'started': datetime.datetime.now()
+        }
+        st.rerun()
+    
+    # The status fragment reruns every few seconds, so it only runs while there is a job
+    if 'schedule_job' in st.session_state:
+        _schedule_job_status()
 
     # Display download buttons if reports are available (outside button click block)
     if 'processed_reports' in st.session_state:
         st.markdown("### 📥 Download Processed Reports")
         
         reports = st.session_state['processed_reports']
-        col1, col2, col3 = st.columns(3)
         
-        for idx, (filename, data) in enumerate(reports.items()):
-            col = [col1, col2, col3][idx]
+        for col, (kind, (filename, path)) in zip(st.columns(3), reports.items()):
             with col:
                 report_type = filename.split('_')[0]
                 st.download_button(
                     label=f"⬇️ {report_type}",
-                    data=data,
+                    data=functools.partial(_read_file, path),
                     file_name=filename,
                     mime="text/csv",
                     use_container_width=True,
-                    key=f"download_{idx}"
+                    key=f"download_{kind}"
                 )
         
-        # Show preview of processed report (load on-demand from CSV bytes)
+        # Show preview of processed report (sizes and first rows from the processor)
         if 'processed_reports' in st.session_state:
             st.markdown("### 📊 Report Preview")
             
-            reports = st.session_state['processed_reports']
+            previews = st.session_state['processed_previews']
+            meta = st.session_state['processed_reports_meta']
             
             tab_preview1, tab_preview2, tab_preview3 = st.tabs([
                 "Combined Report",
@@ -236,31 +679,13 @@ with tab1:
             
             # Load only first 10 rows for preview (memory efficient)
             with tab_preview1:
-                csv_data = [v for k, v in reports.items() if 'Combined' in k][0]
-                df = pd.read_csv(io.BytesIO(csv_data), nrows=10)
-                total_rows = sum(1 for _ in io.BytesIO(csv_data)) - 1  # Count rows without loading all
-                st.info(f"**Rows:** {total_rows:,} | **Columns:** {len(df.columns)}")
-                st.dataframe(df, use_container_width=True)
-                del df
-                gc.collect()
+                _render_preview(previews, meta, 'combined')
             
             with tab_preview2:
-                csv_data = [v for k, v in reports.items() if 'Processed_PO' in k][0]
-                df = pd.read_csv(io.BytesIO(csv_data), nrows=10)
-                total_rows = sum(1 for _ in io.BytesIO(csv_data)) - 1
-                st.info(f"**Rows:** {total_rows:,} | **Columns:** {len(df.columns)}")
-                st.dataframe(df, use_container_width=True)
-                del df
-                gc.collect()
+                _render_preview(previews, meta, 'processed')
             
             with tab_preview3:
-                csv_data = [v for k, v in reports.items() if 'ProcessedDetailed' in k][0]
-                df = pd.read_csv(io.BytesIO(csv_data), nrows=10)
-                total_rows = sum(1 for _ in io.BytesIO(csv_data)) - 1
-                st.info(f"**Rows:** {total_rows:,} | **Columns:** {len(df.columns)}")
-                st.dataframe(df, use_container_width=True)
-                del df
-                gc.collect()
+                _render_preview(previews, meta, 'detailed')
 
 
 # -------------------------------
@@ -303,13 +728,15 @@ with tab2:
                 
                 try:
                     with st.spinner(f"Downloading report for Job ID: {job_id_input}..."):
-                        file_data = download_po_report(job_id_input)
+                        raw_path = _new_report_file('last_download_path', '.xls')
+                        download_po_report_to_file(job_id_input, raw_path)
+                        file_size = os.path.getsize(raw_path)
                         
                         # Success message
                         st.success(f"""
                         ✅ **Report Downloaded Successfully!**
                         - **Job ID:** {job_id_input}
-                        - **File Size:** {len(file_data):,} bytes ({len(file_data) / 1024 / 1024:.2f} MB)
+                        - **File Size:** {file_size:,} bytes ({file_size / 1024 / 1024:.2f} MB)
                         """)
                         
                         if process_existing:
@@ -318,36 +745,28 @@ with tab2:
                                 from_date_default = DEFAULT_FROM_DATE
                                 to_date_default = datetime.date.today().strftime("%m-%d-%Y")
                                 
-                                # Process the report using streaming (memory optimized)
-                                reports_dict = process_po_report_streaming(
-                                    file_data,
+                                # Process the report (memory optimized, cached on contents)
+                                processed = _process_report(
+                                    raw_path,
                                     from_date_default,
-                                    to_date_default
-                                )
-                                
-                                # Format filenames
-                                reports = save_reports_streaming(
-                                    reports_dict,
-                                    from_date_default,
-                                    to_date_default
+                                    to_date_default,
+                                    _report_files(),
+                                    _processed_reports()
                                 )
                                 
                                 st.success("✅ All reports processed successfully!")
                                 
-                                # Store ONLY CSV bytes in session state
-                                st.session_state['processed_reports_tab2'] = reports
-                                
-                                # Clear memory
-                                del reports_dict
-                                del file_data
-                                gc.collect()
+                                # Store ONLY temp file paths in session state
+                                _store_report_files(processed['report_files'], 'processed_reports_tab2')
+                                st.session_state['processed_previews_tab2'] = processed['previews']
+                                st.session_state['processed_reports_meta_tab2'] = processed['meta']
                                 
                         else:
                             # Just provide raw download
                             filename = f"PO_Report_{job_id_input}.xls"
                             st.download_button(
                                 label="⬇️ Download Raw Excel File",
-                                data=file_data,
+                                data=functools.partial(_read_file, raw_path),
                                 file_name=filename,
                                 mime="application/vnd.ms-excel",
                                 use_container_width=True
@@ -375,53 +794,35 @@ with tab2:
         st.markdown("### 📥 Download Processed Reports")
         
         reports = st.session_state['processed_reports_tab2']
-        col1, col2, col3 = st.columns(3)
         
-        for idx, (filename, data) in enumerate(reports.items()):
-            col = [col1, col2, col3][idx]
+        for col, (kind, (filename, path)) in zip(st.columns(3), reports.items()):
             with col:
                 report_type = filename.split('_')[0]
                 st.download_button(
                     label=f"⬇️ {report_type}",
-                    data=data,
+                    data=functools.partial(_read_file, path),
                     file_name=filename,
                     mime="text/csv",
                     use_container_width=True,
-                    key=f"download_existing_{idx}"
+                    key=f"download_existing_{kind}"
                 )
         
-        # Show preview (load on-demand from CSV bytes)
+        # Show preview (sizes and first rows from the processor)
+        previews = st.session_state['processed_previews_tab2']
+        meta = st.session_state['processed_reports_meta_tab2']
         st.markdown("### 📊 Report Preview")
         tab_p1, tab_p2, tab_p3 = st.tabs([
             "Combined", "Processed", "ProcessedDetailed"
         ])
         
         with tab_p1:
-            csv_data = [v for k, v in reports.items() if 'Combined' in k][0]
-            df = pd.read_csv(io.BytesIO(csv_data), nrows=10)
-            total_rows = sum(1 for _ in io.BytesIO(csv_data)) - 1
-            st.info(f"**Rows:** {total_rows:,} | **Columns:** {len(df.columns)}")
-            st.dataframe(df, use_container_width=True)
-            del df
-            gc.collect()
+            _render_preview(previews, meta, 'combined')
             
         with tab_p2:
-            csv_data = [v for k, v in reports.items() if 'Processed_PO' in k][0]
-            df = pd.read_csv(io.BytesIO(csv_data), nrows=10)
-            total_rows = sum(1 for _ in io.BytesIO(csv_data)) - 1
-            st.info(f"**Rows:** {total_rows:,} | **Columns:** {len(df.columns)}")
-            st.dataframe(df, use_container_width=True)
-            del df
-            gc.collect()
+            _render_preview(previews, meta, 'processed')
             
         with tab_p3:
-            csv_data = [v for k, v in reports.items() if 'ProcessedDetailed' in k][0]
-            df = pd.read_csv(io.BytesIO(csv_data), nrows=10)
-            total_rows = sum(1 for _ in io.BytesIO(csv_data)) - 1
-            st.info(f"**Rows:** {total_rows:,} | **Columns:** {len(df.columns)}")
-            st.dataframe(df, use_container_width=True)
-            del df
-            gc.collect()
+            _render_preview(previews, meta, 'detailed')
 
 
 # Footer
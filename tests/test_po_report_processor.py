@@ -0,0 +1,161 @@
+"""
+Tests for the PO report processors
+"""
+
+import csv
+import datetime
+import io
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from PO_report_processor import (
+    REQUIRED_COLUMNS,
+    _df_to_table,
+    _excel_column_to_arrow,
+    _group_cumcount,
+    _table_to_csv_bytes,
+    process_po_report,
+)
+from PO_report_processor_optimized import process_po_report_streaming
+
+
+def _write_report(path, rows):
+    """Write a single-sheet report with the required header to `path`."""
+    wb = Workbook()
+    ws = wb.active
+    ws.append(list(REQUIRED_COLUMNS))
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+
+
+def _csv_column(csv_bytes, name):
+    """Return the values of column `name` from CSV bytes."""
+    return [row[name] for row in csv.DictReader(io.StringIO(csv_bytes.decode('utf-8')))]
+
+
+class MixedKeyColumnTest(unittest.TestCase):
+    """Key columns mixing text and numbers keep whole numbers as written."""
+    
+    def test_excel_column_to_arrow_renders_whole_floats_as_ints(self):
+        arr = _excel_column_to_arrow(['INV-9', 12345.0, 777.0, 1.5, ''])
+        self.assertEqual(arr.to_pylist(), ['INV-9', '12345', '777', '1.5', None])
+    
+    def test_df_to_table_renders_whole_floats_as_ints(self):
+        df = pd.DataFrame({'Invoice Number': pd.Series(['INV-9', 5.0, 7, 2.5, None], dtype=object)})
+        self.assertEqual(
+            _df_to_table(df).column('Invoice Number').to_pylist(),
+            ['INV-9', '5', '7', '2.5', None]
+        )
+    
+    def test_reports_keep_mixed_invoice_numbers(self):
+        rows = [
+            ['PO-1', 'A1', 'Sup A', 'SAR', 'INV-9', 1, 100, 100, 50, 100, 100],
+            ['PO-1', 'A1', 'Sup A', 'SAR', 12345, 1, 200, 200, 200, 200, 200],
+            ['PO-2', 'A2', 'Sup B', 'SAR', 777, 1, 300, 300, 100, 300, 300],
+        ]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'report.xlsx')
+            _write_report(path, rows)
+            reports = process_po_report_streaming(path, '01-01-2020', '01-31-2020')
+        
+        for kind in ('combined', 'processed', 'detailed'):
+            with self.subTest(report=kind):
+                self.assertEqual(
+                    sorted(_csv_column(reports[kind], 'Invoice Number')),
+                    ['12345', '777', 'INV-9']
+                )
+    
+    def test_processed_reports_order_mixed_invoice_numbers(self):
+        # Each invoice has two lines sharing PO, invoice and line number;
+        # only the first in key order (Line Amount 200) keeps its amount.
+        # Enough groups that an unstable sort would reorder them.
+        rows = []
+        for i in range(30):
+            invoice = f'INV-{i}' if i % 2 else 1000 + i
+            rows.append(['PO-1', 'A1', 'Sup A', 'SAR', invoice, 1, 300, 300, 300, 300, 300])
+            rows.append(['PO-1', 'A1', 'Sup A', 'SAR', invoice, 1, 200, 200, 200, 200, 200])
+        invoices = sorted(f'INV-{i}' if i % 2 else str(1000 + i) for i in range(30))
+        expected = [(invoice, amount) for invoice in invoices for amount in ('200', '0')]
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'report.xlsx')
+            _write_report(path, rows)
+            reports = process_po_report_streaming(path, '01-01-2020', '01-31-2020')
+            _, processed_df, _ = process_po_report(path, '01-01-2020', '01-31-2020')
+        
+        streamed = zip(
+            _csv_column(reports['processed'], 'Invoice Number'),
+            _csv_column(reports['processed'], 'Line Amount')
+        )
+        self.assertEqual(list(streamed), expected)
+        self.assertEqual(
+            [(str(i), str(a)) for i, a in zip(processed_df['Invoice Number'], processed_df['Line Amount'])],
+            expected
+        )
+
+
+class GroupCumcountTest(unittest.TestCase):
+    """_group_cumcount numbers rows like groupby().cumcount()."""
+    
+    def test_matches_pandas_with_null_keys(self):
+        df = pd.DataFrame({'a': ['x', None, 'x', None, 'y'], 'b': [1, 1, 1, 1, 2]})
+        np.testing.assert_array_equal(
+            _group_cumcount(df, ['a', 'b']),
+            df.groupby(['a', 'b']).cumcount().to_numpy()
+        )
+
+
+class CsvFormatTest(unittest.TestCase):
+    """Values Arrow would format differently are written as pandas wrote them."""
+    
+    def test_bool_duration_and_time_columns(self):
+        df = pd.DataFrame({
+            'Flag': [True, False, None],
+            'Lead Time': pd.to_timedelta(['5h', '1 day 00:00:01.5', None]),
+            'Cutoff': [datetime.time(5), datetime.time(5, 0, 0, 500000), None],
+        })
+        written = _table_to_csv_bytes(_df_to_table(df))
+        expected = df.to_csv(index=False).encode('utf-8')
+        self.assertEqual(list(csv.reader(io.StringIO(written.decode('utf-8')))),
+                         list(csv.reader(io.StringIO(expected.decode('utf-8')))))
+
+
+class BlankAmountColumnTest(unittest.TestCase):
+    """An all-blank amount column is written as empty cells."""
+    
+    def test_reports_with_blank_amount_received(self):
+        rows = [
+            ['PO-1', 'A1', 'Sup A', 'SAR', 'INV-1', 1, 100, 100, None, 100, 100],
+            ['PO-2', 'A1', 'Sup A', 'SAR', 'INV-2', 1, 200, 200, None, 200, 200],
+            ['PO-2', 'A1', 'Sup A', 'SAR', 'INV-2', 1, 200, 200, None, 200, 200],
+        ]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'report.xlsx')
+            _write_report(path, rows)
+            reports = process_po_report_streaming(path, '01-01-2020', '01-31-2020')
+        
+        self.assertEqual(_csv_column(reports['detailed'], 'Amount Received'), ['', '', ''])
+        self.assertEqual(_csv_column(reports['detailed'], 'Amount_recieved_in_SAR'), ['', '', ''])
+
+
+class WorkbookFormatTest(unittest.TestCase):
+    """Raw reports open by their contents, not their file extension."""
+    
+    def test_xlsx_saved_as_xls(self):
+        rows = [['PO-1', 'A1', 'Sup A', 'SAR', 'INV-1', 1, 100, 100, 50, 100, 100]]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'report.xls')
+            _write_report(path, rows)
+            reports = process_po_report_streaming(path, '01-01-2020', '01-31-2020')
+        
+        self.assertEqual(reports['meta']['combined']['rows'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()